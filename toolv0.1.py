@@ -1,8 +1,15 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
+import io
+import os
+import hashlib
+import tempfile
+import time
 from datetime import datetime
+from importlib.util import find_spec
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -33,47 +40,250 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# --- OPTIONAL ACCELERATORS (used only when installed; output matches the defaults) ---
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Set DASHBOARD_PYARROW_CSV=0 to force pandas' C parser (both give identical frames)
+USE_PYARROW_CSV = os.environ.get('DASHBOARD_PYARROW_CSV', '1') != '0'
+CSV_ENGINE = 'pyarrow' if USE_PYARROW_CSV and pyarrow is not None else 'c'
+EXCEL_ENGINE = 'calamine' if find_spec('python_calamine') else None
+
+# Parsed portfolios are persisted as Parquet (pyarrow only) so app restarts skip
+# the CSV parse. The directory is private to the user running the app; bump the
+# version whenever parse_portfolio's output changes so stale frames are never served
+PARQUET_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'finance-dashboard') if pyarrow is not None else None
+PARQUET_CACHE_VERSION = 3
+PARQUET_CACHE_ERRORS = (OSError, ValueError) + ((pyarrow.ArrowException,) if pyarrow is not None else ())
+PARQUET_CACHE_MAX_FILES = 20
+PARQUET_CACHE_MAX_AGE = 7 * 24 * 3600  # seconds since last use
+
+HAS_NUMBA = find_spec('numba') is not None
+NUMBA_MIN_ROWS = 1_000_000  # below this numba's import/compile cost outweighs the fused pass
+
+def option_metrics_loop(strike, last, bid, ask, pc_code, key_level, spread, position_value):
+    # One pass over the price arrays; pc_code is 0 for puts, 1 for calls
+    for i in range(strike.shape[0]):
+        key_level[i] = strike[i] if pc_code[i] == 0 else strike[i] + last[i]
+        spread[i] = ask[i] - bid[i]
+        position_value[i] = last[i] * 100
+
+# numba is imported on first use, so small portfolios never load it; cache=True
+# keeps the compiled kernel on disk across restarts. parallel=True is avoided
+# because numba's default threading layer hangs under Streamlit's script threads
+@st.cache_resource
+def get_option_metrics_kernel():
+    from numba import njit
+    return njit(cache=True)(option_metrics_loop)
+
 # --- HELPER FUNCTIONS ---
+# Categorical keys make the ==/isin/groupby filters cheap. Prices are left to
+# inference since they may carry a broker prefix that clean_price strips;
+# Expiry is pinned to float64 (it has 'null's) so pyarrow doesn't guess int
+DTYPES = {
+    'Symbol': 'category', 'Type': 'category', 'P/C': 'category',
+    'Strike': 'float64', 'Expiry': 'float64',
+}
+
+def clean_price(values):
+    # Strip broker prefixes like 'C18.90'; anything unparseable becomes 0
+    if values.dtype.kind in 'fiu':
+        # Already numeric (no prefixes in this column): skip the per-element loop
+        out = values.astype(np.float64)
+        out[np.isnan(out)] = 0.0
+        return out
+    out = np.empty(len(values), dtype=np.float64)
+    for i, v in enumerate(values):
+        try:
+            out[i] = float(str(v).replace('C', ''))
+        except ValueError:
+            out[i] = 0.0
+    out[np.isnan(out)] = 0.0
+    return out
+
+def parse_portfolio(file_bytes, file_name):
+    file = io.BytesIO(file_bytes)
+    if file_name.endswith('.csv'):
+        df = pd.read_csv(file, dtype=DTYPES, engine=CSV_ENGINE)
+    else:
+        df = pd.read_excel(file, engine=EXCEL_ENGINE)
+        
+    # 1. Clean Prices (Remove 'C' and convert)
+    cols_to_clean = ['Last', 'Bid', 'Ask']
+    for col in cols_to_clean:
+        if col in df.columns:
+            df[col] = clean_price(df[col].to_numpy())
+
+    # Bid/Ask only feed the displayed spread, so 32 bits are plenty. Strike and Last
+    # stay float64: they produce the labels, dollar totals and price levels
+    for col in ['Bid', 'Ask']:
+        if col in df.columns:
+            df[col] = df[col].astype('float32')
+    df['Expiry'] = df['Expiry'].astype('Int32')
+
+    # 2. Expiry (YYYYMM; build month offsets from epoch directly)
+    expiry = df['Expiry'].fillna(0).to_numpy(dtype=np.int64)
+    year, month = expiry // 100, expiry % 100
+    # Years outside datetime64[ns]'s range would wrap silently on the cast below
+    valid = (year >= 1678) & (year <= 2261) & (month >= 1) & (month <= 12)
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0)
+    expiry_date = months.astype('datetime64[M]').astype('datetime64[ns]')
+    expiry_date[~valid] = np.datetime64('NaT')
+    df['Expiry_Date'] = expiry_date
+    
+    # 3. Filter Options
+    df_opt = df[df['Type'] == 'OPT'].copy()
+    # Keep only symbols that hold options so the sidebar can list categories directly
+    df_opt['Symbol'] = df_opt['Symbol'].astype('category').cat.remove_unused_categories()
+    
+    # 4. Financial Calculations
+    # Logic: Puts -> Assignment Price | Calls -> Break Even
+    strike = df_opt['Strike'].to_numpy(dtype=np.float64)
+    last = df_opt['Last'].to_numpy(dtype=np.float64)
+    bid = df_opt['Bid'].to_numpy(dtype=np.float64)
+    ask = df_opt['Ask'].to_numpy(dtype=np.float64)
+    is_put = df_opt['P/C'].to_numpy() == 'P'
+    n = len(df_opt)
+    if HAS_NUMBA and n > NUMBA_MIN_ROWS:
+        key_level, spread, position_value = np.empty(n), np.empty(n), np.empty(n)
+        pc_code = np.where(is_put, 0, 1).astype(np.uint8)
+        get_option_metrics_kernel()(strike, last, bid, ask, pc_code, key_level, spread, position_value)
+    else:
+        key_level = np.where(is_put, strike, strike + last)
+        spread = ask - bid
+        position_value = last * 100 # Assuming 100 multiplier
+    
+    df_opt['Position_Value'] = position_value
+    df_opt['Spread'] = spread.astype(np.float32)
+    df_opt['Key_Level'] = key_level
+    df_opt['Level_Type'] = np.where(is_put, 'Assignment Price', 'Break-Even Price')
+    
+    # Labels (str() round-trips the strike; whole strikes drop the '.0', e.g. "AMZN 190P")
+    df_opt['Label'] = [
+        f"{sym} {str(k).removesuffix('.0')}{p}" for sym, k, p in zip(df_opt['Symbol'].tolist(), df_opt['Strike'].tolist(), df_opt['P/C'].tolist())
+    ]
+    return df_opt
+
+def read_parquet_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        df_opt = pd.read_parquet(cache_path)
+    except PARQUET_CACHE_ERRORS:
+        # Unreadable cache file: drop it so the upload is re-parsed and re-cached
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+    # Mark as recently used so prune_parquet_cache keeps it
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+    return df_opt
+
+def prune_parquet_cache():
+    # Keep the newest PARQUET_CACHE_MAX_FILES files used within PARQUET_CACHE_MAX_AGE;
+    # files from older cache versions can never be read again, so they go too
+    current = f"v{PARQUET_CACHE_VERSION}-"
+    entries, stale = [], []
+    try:
+        for entry in os.scandir(PARQUET_CACHE_DIR):
+            if entry.name.startswith(current) and entry.name.endswith('.parquet'):
+                entries.append((entry.stat().st_mtime, entry.path))
+            elif entry.name.endswith('.parquet'):
+                stale.append(entry.path)
+    except OSError:
+        return
+    entries.sort(reverse=True)
+    cutoff = time.time() - PARQUET_CACHE_MAX_AGE
+    stale += [path for rank, (mtime, path) in enumerate(entries) if rank >= PARQUET_CACHE_MAX_FILES or mtime < cutoff]
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def write_parquet_cache(df_opt, cache_path):
+    # Cache is best-effort; write to a temp file and rename so readers never see a partial file
+    tmp_path = None
+    try:
+        os.makedirs(PARQUET_CACHE_DIR, mode=0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=PARQUET_CACHE_DIR, suffix='.tmp')
+        os.close(fd)
+        df_opt.to_parquet(tmp_path, engine='pyarrow', compression='zstd')
+        os.replace(tmp_path, cache_path)
+        prune_parquet_cache()
+    except PARQUET_CACHE_ERRORS:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+# Keyed on the raw bytes so re-uploading the same file hits the cache. The file's
+# SHA-1 is returned too, so reruns reuse it as the figure cache key instead of rehashing
 @st.cache_data
-def load_and_process_data(file):
+def load_and_process_data(file_bytes, file_name):
+    file_key = hashlib.sha1(file_bytes).hexdigest()
     try:
-        if file.name.endswith('.csv'):
-            df = pd.read_csv(file)
-        else:
-            df = pd.read_excel(file)
-            
-        # 1. Clean Prices (Remove 'C' and convert)
-        cols_to_clean = ['Last', 'Bid', 'Ask']
-        for col in cols_to_clean:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.replace('C', '', regex=False)
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-
-        # 2. Expiry & DTE
-        df['Expiry_Str'] = df['Expiry'].fillna(0).astype(int).astype(str)
-        df['Expiry_Date'] = pd.to_datetime(df['Expiry_Str'], format='%Y%m', errors='coerce')
-        df['Days_To_Expiry'] = (df['Expiry_Date'] - datetime.now()).dt.days
+        cache_path, df_opt = None, None
+        if PARQUET_CACHE_DIR:
+            cache_path = os.path.join(PARQUET_CACHE_DIR, f"v{PARQUET_CACHE_VERSION}-{file_key}.parquet")
+            df_opt = read_parquet_cache(cache_path)
+        if df_opt is None:
+            df_opt = parse_portfolio(file_bytes, file_name)
+            if cache_path:
+                write_parquet_cache(df_opt, cache_path)
         
-        # 3. Filter Options
-        df_opt = df[df['Type'] == 'OPT'].copy()
+        # DTE depends on today's date, so it is computed after the Parquet cache
+        expiry_date = df_opt['Expiry_Date'].to_numpy(dtype='datetime64[ns]')
+        df_opt['Days_To_Expiry'] = np.floor((expiry_date - np.datetime64(datetime.now(), 'ns')) / np.timedelta64(1, 'D'))
         
-        # 4. Financial Calculations
-        df_opt['Position_Value'] = df_opt['Last'] * 100 # Assuming 100 multiplier
-        df_opt['Spread'] = df_opt['Ask'] - df_opt['Bid']
+        # Per-(Symbol, P/C) totals for the strategy chart, filtered per rerun.
+        # Kept sorted: px.bar lays out the x-axis in the order it receives rows
+        df_agg = df_opt.groupby(['Symbol', 'P/C'], observed=True)['Position_Value'].sum().reset_index()
         
-        # Logic: Puts -> Assignment Price | Calls -> Break Even
-        df_opt['Key_Level'] = df_opt.apply(
-            lambda x: x['Strike'] if x['P/C'] == 'P' else (x['Strike'] + x['Last']), axis=1
-        )
-        df_opt['Level_Type'] = df_opt['P/C'].map({'P': 'Assignment Price', 'C': 'Break-Even Price'})
-        
-        # Labels
-        df_opt['Label'] = df_opt['Symbol'] + " " + df_opt['Strike'].astype(str) + df_opt['P/C']
-        
-        return df_opt
+        return df_opt, df_agg, file_key
     except Exception as e:
         st.error(f"Data Error: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame(), None
+
+# --- CHART BUILDERS ---
+# Cached per (file, filter) state so reruns from unrelated widgets (e.g. the
+# payoff slider) skip figure construction; the leading-underscore frame isn't
+# hashed. The cache is shared across sessions, so it is bounded
+FIGURE_CACHE = dict(max_entries=64, ttl=3600)
+
+@st.cache_resource(**FIGURE_CACHE)
+def build_pie(file_key, symbols, types, _dff):
+    fig_pie = px.pie(_dff, values='Position_Value', names='Symbol', hole=0.4, template='plotly_dark')
+    fig_pie.update_traces(textinfo='percent+label')
+    return fig_pie
+
+@st.cache_resource(**FIGURE_CACHE)
+def build_bar(file_key, symbols, types, _df_agg):
+    return px.bar(
+        _df_agg[_df_agg['Symbol'].isin(symbols) & _df_agg['P/C'].isin(types)],
+        x='Symbol', y='Position_Value', color='P/C',
+        title="Value Distribution",
+        template='plotly_dark', barmode='group',
+        color_discrete_map={'C': '#00CC96', 'P': '#EF553B'}
+    )
+
+@st.cache_resource(**FIGURE_CACHE)
+def build_timeline(file_key, symbols, types, _dff):
+    fig_timeline = px.scatter(
+        _dff, x='Expiry_Date', y='Symbol', size='Position_Value', color='P/C',
+        title="Positions by Expiry Date (Bubble Size = Value)",
+        template='plotly_dark',
+        hover_data={'Strike': ':.2f', 'Key_Level': ':.2f', 'Position_Value': ':,.0f'}
+    )
+    fig_timeline.update_layout(xaxis_title="Expiry Date", yaxis_title="Symbol")
+    return fig_timeline
 
 # --- MAIN APP ---
 def main():
@@ -86,22 +296,26 @@ def main():
     uploaded_file = st.sidebar.file_uploader("Upload CSV", type=["csv", "xlsx"], key="portfolio_uploader_v2")
     
     if uploaded_file:
-        df = load_and_process_data(uploaded_file)
+        df, df_agg, file_key = load_and_process_data(uploaded_file.getvalue(), uploaded_file.name)
         
         if not df.empty:
             # Filters
-            symbols = st.sidebar.multiselect("Filter by Symbol", options=df['Symbol'].unique(), default=df['Symbol'].unique())
+            syms = df['Symbol'].cat.categories
+            symbols = st.sidebar.multiselect("Filter by Symbol", options=syms, default=syms)
             types = st.sidebar.multiselect("Filter by Type", options=['P', 'C'], default=['P', 'C'])
             
             # Apply Filter
-            dff = df[(df['Symbol'].isin(symbols)) & (df['P/C'].isin(types))]
+            mask = np.logical_and(df['Symbol'].isin(symbols).to_numpy(), df['P/C'].isin(types).to_numpy())
+            dff = df.iloc[mask]
+            chart_key = (file_key, tuple(sorted(symbols)), tuple(sorted(types)))  # selection order doesn't change the figures
             
             # --- TOP ROW METRICS ---
+            stats = dff.agg({'Position_Value': 'sum', 'Days_To_Expiry': 'mean', 'Spread': 'mean'})
             col1, col2, col3, col4 = st.columns(4)
-            col1.metric("Total Exposure", f"${dff['Position_Value'].sum():,.0f}")
-            col2.metric("Positions Count", len(dff))
-            col3.metric("Avg Days to Expiry", f"{dff['Days_To_Expiry'].mean():.0f} Days")
-            col4.metric("Avg Bid/Ask Spread", f"${dff['Spread'].mean():.2f}")
+            col1.metric("Total Exposure", f"${stats['Position_Value']:,.0f}")
+            col2.metric("Positions Count", dff.shape[0])
+            col3.metric("Avg Days to Expiry", f"{stats['Days_To_Expiry']:.0f} Days")
+            col4.metric("Avg Bid/Ask Spread", f"${stats['Spread']:.2f}")
             
             st.divider()
 
@@ -113,20 +327,11 @@ def main():
                 c1, c2 = st.columns(2)
                 with c1:
                     st.subheader("Allocation by Symbol")
-                    fig_pie = px.pie(dff, values='Position_Value', names='Symbol', hole=0.4, template='plotly_dark')
-                    fig_pie.update_traces(textinfo='percent+label')
-                    st.plotly_chart(fig_pie, use_container_width=True)
+                    st.plotly_chart(build_pie(*chart_key, dff), use_container_width=True)
                 
                 with c2:
                     st.subheader("Strategy Breakdown")
-                    fig_bar = px.bar(
-                        dff.groupby(['Symbol', 'P/C'])['Position_Value'].sum().reset_index(),
-                        x='Symbol', y='Position_Value', color='P/C',
-                        title="Value Distribution",
-                        template='plotly_dark', barmode='group',
-                        color_discrete_map={'C': '#00CC96', 'P': '#EF553B'}
-                    )
-                    st.plotly_chart(fig_bar, use_container_width=True)
+                    st.plotly_chart(build_bar(*chart_key, df_agg), use_container_width=True)
 
                 # Row 2: Table
                 st.subheader("Position Details")
@@ -141,21 +346,14 @@ def main():
                 col_a, col_b = st.columns([2, 1])
                 with col_a:
                     st.subheader("📅 Expiry Timeline")
-                    fig_timeline = px.scatter(
-                        dff, x='Expiry_Date', y='Symbol', size='Position_Value', color='P/C',
-                        title="Positions by Expiry Date (Bubble Size = Value)",
-                        template='plotly_dark',
-                        hover_data=['Strike', 'Key_Level']
-                    )
-                    fig_timeline.update_layout(xaxis_title="Expiry Date", yaxis_title="Symbol")
-                    st.plotly_chart(fig_timeline, use_container_width=True)
+                    st.plotly_chart(build_timeline(*chart_key, dff), use_container_width=True)
                 
                 with col_b:
                     st.subheader("⚠️ Liquidity Risk")
-                    st.markdown("Positions with wide Bid-Ask spreads.")
+                    st.markdown("Top 10 positions by Bid-Ask spread.")
                     # FIX: Removed background_gradient to avoid Matplotlib dependency
                     st.dataframe(
-                        dff[['Symbol', 'Strike', 'Spread']].sort_values('Spread', ascending=False)
+                        dff[['Symbol', 'Strike', 'Spread']].nlargest(10, 'Spread')
                         .style.format({'Spread': '${:.2f}'}),
                         use_container_width=True, height=400
                     )
@@ -190,8 +388,8 @@ def main():
                     c_sim2.metric(f"Total Contract Value", f"${contract_val:,.2f}")
                     
                     # Graph Payoff
-                    prices = list(range(int(min_price), int(max_price)))
-                    values = [max(0, p - strike) if pc == 'C' else max(0, strike - p) for p in prices]
+                    prices = np.arange(int(min_price), int(max_price), dtype=np.float32)
+                    values = np.maximum(0, prices - strike) if pc == 'C' else np.maximum(0, strike - prices)
                     
                     fig_payoff = px.line(x=prices, y=values, title=f"Payoff Diagram at Expiry ({pos['Label']})", template='plotly_dark')
                     fig_payoff.add_vline(x=spot_price, line_dash="dash", line_color="yellow", annotation_text="Selected Price")